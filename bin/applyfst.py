@@ -1,12 +1,15 @@
 #!/usr/bin/env python
 
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from os import error
 import pywrapfst as fst
 from fststr import fststr
 import sys
 import itertools
 
+CHUNKSIZE = 64
+
 def compile(fst_file):
     st = fststr.symbols_table_from_alphabet(fststr.EN_SYMB)
     compiler = fst.Compiler(
@@ -17,8 +20,28 @@ def compile(fst_file):
             print(word.strip(), file=compiler)
     return compiler.compile()
 
+def prepare_for_apply(automaton):
+    # Composition is fastest when the right-hand FST is sorted on input
+    # labels; sort once here rather than once per word.
+    if not automaton.properties(fst.I_LABEL_SORTED, False):
+        automaton.arcsort(sort_type='ilabel')
+    return automaton
+
+_worker_fst = None
+
+def _init_worker(fst_file):
+    # Each worker compiles its own copy of the FST rather than receiving a
+    # pickled one from the parent.
+    global _worker_fst
+    _worker_fst = prepare_for_apply(compile(fst_file))
+
+def _apply_word(word):
+    return fststr.apply(word, _worker_fst)
+
 def apply(args):
-    fst = compile(args.fst)
+    # Compile in this process even when workers are used, so that a missing
+    # or malformed FST file is reported once rather than by every worker.
+    fst = prepare_for_apply(compile(args.fst))
     if args.input:
         with open(args.input) as f:
             words = [w.strip() for w in f]
@@ -28,14 +51,23 @@ def apply(args):
     else:
         print('No words provided')
         sys.exit()
-    return words, [fststr.apply(w, fst) for w in words]
+    if args.jobs == 1 or len(words) <= CHUNKSIZE:
+        return words, [fststr.apply(w, fst) for w in words]
+    with ProcessPoolExecutor(max_workers=args.jobs,
+                             initializer=_init_worker,
+                             initargs=(args.fst,)) as executor:
+        return words, list(executor.map(_apply_word, words, chunksize=CHUNKSIZE))
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('-f', '--fst', help='AT&T FST file to apply')
     parser.add_argument('-i', '--input', help='Input file (one item per line)')
     parser.add_argument('-S', '--string', help='Input string')
+    parser.add_argument('-j', '--jobs', type=int,
+                        help='Number of worker processes (default: one per CPU)')
     args = parser.parse_args()
+    if args.jobs is not None and args.jobs < 1:
+        parser.error('--jobs must be at least 1')
     inputs, outputs = apply(args)
     print(outputs)
     for inp, ws in zip(inputs, outputs):
@@ -21,7 +21,9 @@ With FstStr, Step 3 is wrapped up in a single convenience function, `apply`:
 ['ABC']
 """
 
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+import functools
+from operator import attrgetter
 import pywrapfst as fst
 
 
@@ -43,40 +45,69 @@ EN_SYMB = list("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz-''") + \
 def symbols_table_from_alphabet(alphabet):
     """Construct a SymbolTable from a list of strings.
 
+    The table for a given alphabet is built once and cached; each call returns
+    a copy of it, so the result can be modified freely.
+
     Args:
         alphabet: a list of strings to be treated as symbols
 
     Returns:
         SymbolTable: a symbol table with <epsilon> plus the symbols in strings.
     """
+    return _symbols_table_from_alphabet(tuple(alphabet)).copy()
+
+@functools.lru_cache(maxsize=32)
+def _symbols_table_from_alphabet(alphabet):
+    """Build the SymbolTable cached by `symbols_table_from_alphabet`."""
     st = fst.SymbolTable()
     st.add_symbol('<epsilon>', 0)
     for i, symb in enumerate(alphabet):
         st.add_symbol(symb, i+1)
     return st
 
+@functools.lru_cache(maxsize=32)
+def _symbol_trie(symbols):
+    """Build a character trie over a tuple of symbols.
+
+    Each node is a dict mapping a character to the next node. A node at which
+    a symbol ends stores that symbol under the key `None`.
+    """
+    root = {}
+    for symbol in symbols:
+        node = root
+        for char in symbol:
+            node = node.setdefault(char, {})
+        node[None] = symbol
+    return root
+
 def string_to_symbol_list(string, symbols):
     """Return a tokenization of a string into symbols
 
     Before a string can be converted to a linear-chain automaton, it must be
     decomposed into symbols. Some of these symbols may consist of a single
-    character while others may consist of multiple characters.
+    character while others may consist of multiple characters. At each position,
+    the longest symbol that matches is chosen.
 
     Args: string (str): the string to be tokenized sybmols (list): the symbols
         into which the string can be divided Returns: (list): a list of symbols
     """
+    return _tokenize(string, _symbol_trie(tuple(symbols)))
+
+def _tokenize(string, root):
+    """Split `string` into symbols using a trie built by `_symbol_trie`."""
     elements = []
-    symbols = sorted(symbols, key=len, reverse=True)
-    while string:
-        matched = False
-        for symbol in symbols:
-            if symbol == string[0:len(symbol)]:
-                elements.append(symbol)
-                string = string[len(symbol):]
-                matched = True
-                break
-        if not matched:
-            raise IllegalSymbol('Substring "{}" starts with an unknown symbol'.format(string))
+    i, n = 0, len(string)
+    while i < n:
+        node, match, j = root, None, i
+        while j < n and string[j] in node:
+            node = node[string[j]]
+            j += 1
+            if None in node:
+                match, end = node[None], j
+        if match is None:
+            raise IllegalSymbol('Substring "{}" starts with an unknown symbol'.format(string[i:]))
+        elements.append(match)
+        i = end
     return elements
 
 #############################################################################
@@ -86,27 +117,76 @@ def string_to_symbol_list(string, symbols):
 def linear_fst(elements, automata_op, keep_isymbols=True, **kwargs):
     """Produce a linear automaton.
 
-    Based on code from
-    https://stackoverflow.com/questions/9390536/how-do-you-even-give-an-openfst-made-fst-input-where-does-the-output-go.
+    Without Compiler keyword arguments, the automaton is built directly by
+    `linear_fst_fast`; otherwise it is compiled by `linear_fst_compiler`.
 
     Args: elements (list): ordered list of input symbols
         automata_op (Fst): automaton to apply
         keep_isymbols (bool): whether to keep the input symbols
+        kwargs: Additional arguments to the Compiler.
     """
+    if kwargs:
+        return linear_fst_compiler(elements, automata_op, keep_isymbols, **kwargs)
+    return linear_fst_fast(elements, automata_op, keep_isymbols)
+
+def linear_fst_compiler(elements, automata_op, keep_isymbols=True, **kwargs):
+    """Produce a linear automaton by compiling an AT&T description of it.
 
-    st = isymbols=automata_op.input_symbols().copy()
+    Based on code from
+    https://stackoverflow.com/questions/9390536/how-do-you-even-give-an-openfst-made-fst-input-where-does-the-output-go.
 
-    compiler = fst.Compiler(isymbols=st,
+    Args: elements (list): ordered list of input symbols
+        automata_op (Fst): automaton to apply
+        keep_isymbols (bool): whether to keep the input symbols
+        kwargs: Additional arguments to the Compiler.
+    """
+    # The Compiler only reads the symbol table, so no copy is needed.
+    compiler = fst.Compiler(isymbols=automata_op.input_symbols(),
                             keep_isymbols=keep_isymbols,
                             acceptor=keep_isymbols,
                             **kwargs)
     
     for i, el in enumerate(elements):
         print('{} {} {}'.format(i, i+1, el), file=compiler)
-    print(str(i+1), file=compiler)
+    print(str(len(elements)), file=compiler)
 
     return compiler.compile()
 
+def linear_fst_fast(elements, automata_op, keep_isymbols=True, label_of=None):
+    """Produce a linear automaton without going through a Compiler.
+
+    The automaton is a chain of states starting at state 0, with one arc per
+    element whose input and output labels are both the element's label, and
+    with only the last state final. It has the arc type of `automata_op` and,
+    if `keep_isymbols` is set, its input symbols on both sides.
+
+    Args: elements (list): ordered list of input symbols
+        automata_op (Fst): automaton to apply
+        keep_isymbols (bool): whether to keep the input symbols
+        label_of (dict, optional): maps each input symbol to its label. If not
+            given, labels are looked up in the input symbol table.
+    """
+    isymbols = automata_op.input_symbols()
+    chain = fst.VectorFst(automata_op.arc_type())
+    if keep_isymbols:
+        chain.set_input_symbols(isymbols)
+        chain.set_output_symbols(isymbols)
+    one = fst.Weight.one(chain.weight_type())
+    state = chain.add_state()
+    chain.set_start(state)
+    for el in elements:
+        if label_of is None:
+            label = isymbols.find(el)
+        else:
+            label = label_of.get(el, -1)
+        if label == -1:
+            raise IllegalSymbol('Symbol "{}" is not in the input symbol table'.format(el))
+        nextstate = chain.add_state()
+        chain.add_arc(state, fst.Arc(label, label, one, nextstate))
+        state = nextstate
+    chain.set_final(state, one)
+    return chain
+
 #############################################################################
 # Mutating FSTs
 #############################################################################
@@ -134,28 +214,66 @@ def expand_other_symbols(automaton):
             state = stack.pop()
             if state not in visited:
                 visited.add(state)
-                arcs = {}
+                existing, other_arc = set(), None
                 for arc in automaton.arcs(state):
-                    arcs[arc.ilabel] = {
-                        'olabel': arc.olabel,
-                        'nextstate': arc.nextstate
-                    }
-                stack.extend([arc.nextstate for arc in automaton.arcs(state)])
-                if other in arcs:
-                    nextstate = arcs[other]['nextstate']
-                    for symb in keys - set(arcs):
-                        olabel = arcs[other]['olabel']
-                        olabel = symb if olabel == other else olabel
+                    existing.add(arc.ilabel)
+                    if arc.ilabel == other:
+                        other_arc = (arc.olabel, arc.nextstate)
+                    stack.append(arc.nextstate)
+                if other_arc:
+                    olabel, nextstate = other_arc
+                    for symb in keys - existing:
                         automaton.add_arc(
                                 state,
-                                fst.Arc(symb, olabel, 0.0, nextstate))
+                                fst.Arc(symb, symb if olabel == other else olabel,
+                                        0.0, nextstate))
     dfs(automaton.start())
+    clear_cache(automaton)
     return None
 
 #############################################################################
 # Operating on FSTs
 #############################################################################
 
+def _label_map(automaton):
+    """Return a dict mapping each input symbol of `automaton` to its label.
+
+    The dict is built once per FST and kept in its cache entry.
+    """
+    info = _automaton_info(automaton)
+    if 'label_of' not in info:
+        info['label_of'] = {symb: n for (n, symb) in automaton.input_symbols()}
+    return info['label_of']
+
+def _input_labels(automaton):
+    """Return the set of input labels on the arcs of `automaton`.
+
+    The set is computed once per FST and kept in its cache entry.
+    """
+    info = _automaton_info(automaton)
+    if 'ilabels' not in info:
+        info['ilabels'] = frozenset(arc.ilabel
+                                    for state in automaton.states()
+                                    for arc in automaton.arcs(state))
+    return info['ilabels']
+
+def _ilabel_sorted(automaton):
+    """Return `automaton`, or a copy of it sorted on input labels.
+
+    Composition is faster when the right-hand FST is sorted on input labels.
+    If `automaton` is not known to be sorted, a sorted copy is made instead,
+    leaving the caller's FST untouched; the copy is kept in the FST's cache
+    entry.
+    """
+    if automaton.properties(fst.I_LABEL_SORTED, False):
+        return automaton
+    info = _automaton_info(automaton)
+    if 'ilabel_sorted' not in info:
+        ilabel_sorted = automaton.copy()
+        ilabel_sorted.arcsort(sort_type='ilabel')
+        info['ilabel_sorted'] = ilabel_sorted
+    return info['ilabel_sorted']
+
 def apply_fst_to_list(elements, automaton, is_project=True, **kwargs):
     """Compose a linear automata generated from `elements` with `automata_op`.
 
@@ -173,57 +291,292 @@ def apply_fst_to_list(elements, automaton, is_project=True, **kwargs):
         out.project('output')
     return out
 
+def _cached_lattice(elements, automaton):
+    """Compose a linear automaton from `elements` with `automaton` for `apply`.
+
+    Unlike `apply_fst_to_list`, this uses the data cached for `automaton`,
+    returns an empty FST without composing when some element is never read by
+    `automaton`, and does not project the result.
+    """
+    label_of, ilabels = _label_map(automaton), _input_labels(automaton)
+    for el in elements:
+        label = label_of.get(el, -1)
+        if label > 0 and label not in ilabels:
+            # No arc reads this symbol, so the composition would be empty.
+            return fst.VectorFst(automaton.arc_type())
+    linear_automata = linear_fst_fast(elements, automaton, label_of=label_of)
+    return fst.compose(linear_automata, _ilabel_sorted(automaton))
+
+def _acceptor_table(automaton):
+    """Index the arcs of an acceptor so it can be walked directly.
+
+    Returns:
+        (tuple): the start state; a dict mapping each state to a dict from
+            label to the list of states reached on that label; and the set of
+            final states.
+    """
+    zero = fst.Weight.zero(automaton.weight_type()).to_string()
+    arcs, finals = {}, set()
+    for state in automaton.states():
+        out = arcs[state] = {}
+        for arc in automaton.arcs(state):
+            out.setdefault(arc.ilabel, []).append(arc.nextstate)
+        if automaton.final(state).to_string() != zero:
+            finals.add(state)
+    return automaton.start(), arcs, finals
+
+def _single_path(table):
+    """Return True if the acceptor indexed in `table` is deterministic and
+    free of epsilon arcs, so that an accepted string has exactly one path."""
+    _, arcs, _ = table
+    return all(0 not in out and all(len(n) == 1 for n in out.values())
+               for out in arcs.values())
+
+def _acceptor_accepts(labels, table):
+    """Return True if the acceptor indexed in `table` accepts `labels`.
+
+    Tracks the set of states reachable after each label, following
+    epsilon arcs (label 0) without consuming input.
+    """
+    start, arcs, finals = table
+    def closure(states):
+        stack = list(states)
+        while stack:
+            for nextstate in arcs[stack.pop()].get(0, ()):
+                if nextstate not in states:
+                    states.add(nextstate)
+                    stack.append(nextstate)
+        return states
+    if start == -1:
+        return False
+    states = closure({start})
+    for label in labels:
+        states = closure({nextstate for state in states
+                          for nextstate in arcs[state].get(label, ())})
+        if not states:
+            return False
+    return not finals.isdisjoint(states)
+
 #############################################################################
 # Extracting strings from FSTs
 #############################################################################
 
-def all_strings_from_chain(automaton):
+_nextstate_olabel = attrgetter('nextstate', 'olabel')
+
+def _arc_table(automaton):
+    """Copy the arcs of `automaton` into Python lists.
+
+    Returns a list indexed by state id whose items are lists of
+    (nextstate, olabel) pairs, in arc order.
+    """
+    arcs = automaton.arcs
+    return [list(map(_nextstate_olabel, arcs(state)))
+            for state in automaton.states()]
+
+def _symbol_list(symb_tab):
+    """Return a list mapping each key of `symb_tab` to its symbol.
+
+    Epsilon (key 0) and keys without a symbol map to the empty string.
+    """
+    symbols = dict(symb_tab)
+    id2sym = [''] * (max(symbols, default=0) + 1)
+    for key, symbol in symbols.items():
+        if key:
+            id2sym[key] = symbol
+    return id2sym
+
+def _output_symbol_list(automaton):
+    """Return `_symbol_list` of the output symbols of `automaton`, or of its
+    input symbols if it has no output symbol table."""
+    symb_tab = automaton.output_symbols()
+    if symb_tab is None:
+        symb_tab = automaton.input_symbols()
+    return _symbol_list(symb_tab)
+
+def iter_strings_from_chain(automaton, unique=False, id2sym=None):
+    """Yield the strings implied by a non-cyclic automaton, one path at a time
+
+    Strings are yielded as they are found and finished strings are not kept
+    (except to skip repeats when `unique` is set), so this can be consumed
+    lazily when the automaton has too many paths to list at once. Strings are
+    read off the output labels, so the automaton need not be projected.
+
+    Args:
+        automaton (Fst): a non-cyclic finite state automaton
+        unique (bool, optional): whether to skip strings already yielded
+        id2sym (list, optional): the symbol for each label, with '' for
+            epsilon. Built from the automaton's output symbol table (or its
+            input symbol table, if it has none) if not given.
+    Yields:
+        (str): the string spelled out by each path to a sink
+    Raises:
+        FstError: when the walk reaches a cycle
+    """
+    start = automaton.start()
+    if start == -1:
+        # No start state, so there are no paths.
+        return
+    if id2sym is None:
+        id2sym = _output_symbol_list(automaton)
+    arcs = _arc_table(automaton)
+    # Each stack entry carries the string spelled out on the way to its state,
+    # so siblings share their parent's prefix and epsilon arcs pass it on
+    # unchanged. `path` holds the states on the current path (`on_path` as a
+    # set); an arc back to one of them closes a cycle. Arcs are pushed in
+    # reverse to keep arc order.
+    path, on_path = [], set()
+    seen = set()
+    stack = [(start, 0, '')]
+    while stack:
+        state, depth, prefix = stack.pop()
+        on_path.difference_update(path[depth:])
+        del path[depth:]
+        path.append(state)
+        on_path.add(state)
+        if arcs[state]:
+            for nextstate, olabel in reversed(arcs[state]):
+                if nextstate in on_path:
+                    raise FstError('FSA resulting from composition of FST and linear chain automaton has cycles. Cannot extract set of strings.')
+                if olabel:
+                    stack.append((nextstate, depth + 1, prefix + id2sym[olabel]))
+                else:
+                    stack.append((nextstate, depth + 1, prefix))
+        elif not unique:
+            yield prefix
+        elif prefix not in seen:
+            seen.add(prefix)
+            yield prefix
+
+def all_strings_from_chain(automaton, unique=False, id2sym=None):
     """Return all strings implied by a non-cyclic automaton
 
+    Strings are read off the output labels; see `iter_strings_from_chain`.
+
     Args:
-        chain (Fst): a non-cyclic finite state automaton
+        automaton (Fst): a non-cyclic finite state automaton
+        unique (bool, optional): whether to drop repeated strings, keeping the
+            first occurrence of each.
+        id2sym (list, optional): the symbol for each label, with '' for
+            epsilon. Built from the automaton's symbol tables if not given.
     Returns:
         (list): a list of strings
     """
-    def dfs(graph, path, paths=[]):
-        target, label = path[-1]
-        if graph.num_arcs(target):
-            for arc in graph.arcs(target):
-                new_target = arc.nextstate
-                new_label = arc.olabel
-                new_path = path + [(new_target, new_label)]
-                paths = dfs(graph, new_path, paths)
-        else:
-            paths += [path]
-        return paths
-    if automaton.properties(fst.CYCLIC, True) == fst.CYCLIC:
-        raise FstError('FSA resulting from composition of FST and linear chain automaton has cycles. Cannot extract set of strings.')
-    start = automaton.start()
-    paths = dfs(automaton, [(start, 0)])
-    symb_tab = automaton.input_symbols().copy()
-    strings = []
-    for path in paths:
-        strings.append(''.join([symb_tab.find(k) for (_, k) in path if k]))
-    return strings
+    return list(iter_strings_from_chain(automaton, unique=unique, id2sym=id2sym))
+
+#############################################################################
+# Caching data derived from FSTs
+#############################################################################
+
+"""The number of FSTs for which `apply` keeps derived data"""
+CACHE_SIZE = 8
+
+"""The number of `apply` results kept, across all FSTs"""
+RESULT_CACHE_SIZE = 4096
+
+_automaton_cache = OrderedDict()
+_result_cache = OrderedDict()
+
+def _automaton_info(automaton):
+    """Return a dict of data derived from `automaton`, filled in on demand.
+
+    Entries are keyed on id(automaton) and keep a reference to the automaton,
+    so an id cannot be reused by another FST while its entry exists. Only the
+    CACHE_SIZE most recently used FSTs are kept.
+    """
+    key = id(automaton)
+    entry = _automaton_cache.get(key)
+    if entry is None:
+        entry = _automaton_cache[key] = (automaton, {})
+        while len(_automaton_cache) > CACHE_SIZE:
+            evicted, _ = _automaton_cache.popitem(last=False)
+            _drop_results(evicted)
+    else:
+        _automaton_cache.move_to_end(key)
+    return entry[1]
+
+def _drop_results(key):
+    """Remove the cached `apply` results for the FST whose id is `key`."""
+    for result_key in [k for k in _result_cache if k[0] == key]:
+        del _result_cache[result_key]
+
+def clear_cache(automaton=None):
+    """Discard the data `apply` has cached for an FST.
+
+    `apply` caches data derived from the last CACHE_SIZE FSTs it was given
+    (such as their symbols and the results of recent calls). Call this after
+    mutating an FST that has already been applied, or with no argument to
+    release the data cached for every FST. `expand_other_symbols` clears the
+    cache for the FST it mutates.
+
+    Args: automaton (Fst, optional): the FST whose cached data is discarded
+    """
+    if automaton is None:
+        _automaton_cache.clear()
+        _result_cache.clear()
+    else:
+        _automaton_cache.pop(id(automaton), None)
+        _drop_results(id(automaton))
 
 #############################################################################
 # High-level convenience functions
 #############################################################################
 
-def apply(string, automaton):
+def apply(string, automaton, unique=False):
     """Apply an FST to a string and get back the transduced strings
 
+    If `automaton` is an acceptor and either `unique` is set or the acceptor
+    is deterministic and epsilon-free, it is walked directly over the input
+    rather than composed with it.
+
     Args:
         string (str): the string to which the FST is applied
         automaton: the FST applied to the string
+        unique (bool, optional): whether to drop repeated output strings
     Returns:
         list: strings that result from the application of the FST to the string
     """
-    symbols = [x for (_, x) in automaton.input_symbols()]
-    elements = string_to_symbol_list(string, symbols)
-    lattice = apply_fst_to_list(elements, automaton)
+    # Results are only cached while the FST has an entry in the FST cache,
+    # which keeps its id from being reused.
+    _automaton_info(automaton)
+    key = (id(automaton), string, unique)
+    result = _result_cache.get(key)
+    if result is None:
+        result = _result_cache[key] = tuple(_apply(string, automaton, unique))
+        while len(_result_cache) > RESULT_CACHE_SIZE:
+            _result_cache.popitem(last=False)
+    else:
+        _result_cache.move_to_end(key)
+    return list(result)
+
+def _apply(string, automaton, unique):
+    """Compute the result of `apply` without consulting its result cache."""
+    info = _automaton_info(automaton)
+    if 'trie' not in info:
+        symbols = tuple(x for (_, x) in automaton.input_symbols())
+        info['trie'] = _symbol_trie(symbols)
+    elements = _tokenize(string, info['trie'])
+    if 'acceptor' not in info:
+        is_acceptor = automaton.properties(fst.ACCEPTOR, True)
+        info['acceptor'] = _acceptor_table(automaton) if is_acceptor else None
+        info['single_path'] = is_acceptor and _single_path(info['acceptor'])
+    if 'id2sym' not in info:
+        info['id2sym'] = _output_symbol_list(automaton)
+    acceptor = info['acceptor']
+    if acceptor is not None and (unique or info['single_path']):
+        # An acceptor outputs its input, so walk it over the input labels
+        # instead of composing. This yields each accepted string once, which
+        # matches composition only if repeats are dropped or there is a
+        # single path. Epsilon symbols in the input are skipped.
+        label_of = _label_map(automaton)
+        labels = [label_of[el] for el in elements if label_of[el]]
+        if not _acceptor_accepts(labels, acceptor):
+            return []
+        return [''.join(info['id2sym'][l] for l in labels)]
+    # Strings are read off the output labels, so projection is not needed.
+    lattice = _cached_lattice(elements, automaton)
     if lattice.num_states() > 0:
-        strings = all_strings_from_chain(lattice)
+        strings = all_strings_from_chain(lattice, unique=unique,
+                                         id2sym=info['id2sym'])
         return strings
     else:
         return []
@@ -232,20 +585,23 @@ def apply(string, automaton):
 def main():
     symbols = list('abcABC') + ['<other>']
     symb_tab = symbols_table_from_alphabet(symbols)
-    # Construct compiler
-    compiler = fst.Compiler(isymbols=symb_tab, osymbols=symb_tab, keep_isymbols=True, keep_osymbols=True)
-    # Define transition table and print it to the compiler
-    definition = \
-"""0 1 <other> <other>
-1 2 b B
-1 0 <other> <epsilon>
-0 2 a A
-2
-0
-"""
-    print(definition, file=compiler)
-    # Compile the description, returning an Fst object
-    scramble = compiler.compile()
+    # Build the FST directly: add its states, then an arc for each
+    # transition, mapping symbols to labels with the symbol table
+    scramble = fst.VectorFst()
+    scramble.set_input_symbols(symb_tab)
+    scramble.set_output_symbols(symb_tab)
+    one = fst.Weight.one(scramble.weight_type())
+    q0, q1, q2 = scramble.add_state(), scramble.add_state(), scramble.add_state()
+    scramble.set_start(q0)
+    transitions = [(q0, q1, '<other>', '<other>'),
+                   (q1, q2, 'b', 'B'),
+                   (q1, q0, '<other>', '<epsilon>'),
+                   (q0, q2, 'a', 'A')]
+    for state, nextstate, isymb, osymb in transitions:
+        scramble.add_arc(state, fst.Arc(symb_tab.find(isymb), symb_tab.find(osymb),
+                                        one, nextstate))
+    scramble.set_final(q2, one)
+    scramble.set_final(q0, one)
     print('original fst')
     print(scramble.__str__())
     # Add transitions implied by <other>
@@ -0,0 +1,77 @@
+import pytest
+
+fst = pytest.importorskip('pywrapfst')
+
+from fststr import fststr
+
+
+def compile_fst(description, alphabet):
+    """Compile an FST from an AT&T description over `alphabet`."""
+    st = fststr.symbols_table_from_alphabet(alphabet)
+    compiler = fst.Compiler(isymbols=st, osymbols=st, keep_isymbols=True,
+                            keep_osymbols=True)
+    print(description, file=compiler)
+    return compiler.compile()
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    fststr.clear_cache()
+    yield
+    fststr.clear_cache()
+
+
+def test_repeated_apply_gives_same_result():
+    f = compile_fst('0 1 a x\n0 1 a y\n1\n', list('axy'))
+    first = fststr.apply('a', f)
+    assert sorted(first) == ['x', 'y']
+    first.append('z')
+    assert fststr.apply('a', f) == fststr.apply('a', f)
+    assert sorted(fststr.apply('a', f)) == ['x', 'y']
+
+
+def test_clear_cache_after_mutation():
+    f = compile_fst('0 1 a x\n1\n', list('axy'))
+    assert fststr.apply('a', f) == ['x']
+    label_of = dict((sym, key) for (key, sym) in f.input_symbols())
+    one = fst.Weight.one(f.weight_type())
+    f.add_arc(0, fst.Arc(label_of['a'], label_of['y'], one, 1))
+    fststr.clear_cache(f)
+    assert sorted(fststr.apply('a', f)) == ['x', 'y']
+
+
+@pytest.mark.parametrize('description', [
+    '0 0 a a\n0 1 b b\n1 1 a a\n1\n',
+    '0 1 a a\n0 1 a a\n1 2 b b\n2\n',
+])
+@pytest.mark.parametrize('word', ['ab', 'aba', 'a', 'bb'])
+@pytest.mark.parametrize('unique', [False, True])
+def test_acceptor_matches_composition(description, word, unique):
+    acceptor = compile_fst(description, list('ab'))
+    composed = fststr.apply_fst_to_list(list(word), acceptor)
+    expected = fststr.all_strings_from_chain(composed, unique=unique)
+    assert fststr.apply(word, acceptor, unique=unique) == expected
+
+
+@pytest.mark.parametrize('description,expected', [
+    ('0 1 a a\n1\n', ['a']),
+    ('0 1 a b\n1\n', ['b']),
+])
+def test_apply_without_output_symbols(description, expected):
+    f = compile_fst(description, list('ab'))
+    f.set_output_symbols(None)
+    assert fststr.apply('a', f) == expected
+    assert fststr.apply('b', f) == []
+
+
+def test_tokenization_takes_longest_match():
+    symbols = ['a', 'ab', 'abc', 'b']
+    assert fststr.string_to_symbol_list('abcab', symbols) == ['abc', 'ab']
+    assert fststr.string_to_symbol_list('abb', symbols) == ['ab', 'b']
+    assert (fststr.string_to_symbol_list('fox<^>s<#>', fststr.EN_SYMB) ==
+            ['f', 'o', 'x', '<^>', 's', '<#>'])
+
+
+def test_tokenization_rejects_unknown_symbol():
+    with pytest.raises(fststr.IllegalSymbol):
+        fststr.string_to_symbol_list('fo!x', fststr.EN_SYMB)